@@ -5,6 +5,8 @@ from typing import Optional
 
 # HTTP Bearer token security scheme
 security = HTTPBearer()
+# Same scheme, but a missing token yields None instead of a 403
+optional_security = HTTPBearer(auto_error=False)
 
 
 async def get_current_user_id(
@@ -15,7 +17,7 @@ async def get_current_user_id(
     """
     try:
         token = credentials.credentials
-        user_id = clerk_auth.get_user_id(token)
+        user_id = await clerk_auth.get_user_id(token)
         return user_id
     except Exception as e:
         raise HTTPException(
@@ -26,9 +28,7 @@ async def get_current_user_id(
 
 
 async def get_optional_user_id(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(
-        HTTPBearer(auto_error=False)
-    ),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
 ) -> Optional[str]:
     """
     Extract user ID from token if present, return None if not authenticated
@@ -39,7 +39,7 @@ async def get_optional_user_id(
 
     try:
         token = credentials.credentials
-        user_id = clerk_auth.get_user_id(token)
+        user_id = await clerk_auth.get_user_id(token)
         return user_id
     except:
         return None
@@ -1,17 +1,42 @@
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+import logging
 import os
 
 # Load environment variables
 load_dotenv()
 
+logging.basicConfig(level=logging.INFO)
+
 from app.routers import jobs
+from app.services.clerk_auth import clerk_auth
+from app.services.sqs_client import get_sqs
+from app.services.supabase_client import get_supabase
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open pooled clients and start SQS batching on startup,
+    # flush pending messages and close connections on shutdown
+    await get_supabase().connect()
+    await get_sqs().start()
+    yield
+    await get_sqs().stop()
+    # Pending "failed" status writes need the Supabase client, so finish them first
+    await jobs.drain_background_tasks()
+    await get_supabase().close()
+    await clerk_auth.close()
+
 
 app = FastAPI(
     title="Robotics Training Job Manager API",
     description="API for managing robotics policy network training jobs",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS
@@ -19,8 +44,10 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  # Next.js frontend
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*", "Authorization"],  # Explicitly allow Authorization header
+    # Only what the JSON API actually uses, so preflight checks stay cheap
+    allow_methods=["GET", "POST", "PUT"],
+    allow_headers=["authorization", "content-type"],
+    expose_headers=[],
 )
 
 # Include routers
@@ -45,4 +72,16 @@ if __name__ == "__main__":
     import uvicorn
 
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # os.cpu_count() reports host CPUs inside a container, so cap the default;
+    # set WEB_CONCURRENCY to match the container's actual CPU allocation
+    default_workers = min(os.cpu_count() or 1, 4)
+    # Workers need an import string; uvloop/httptools come with uvicorn[standard]
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", default_workers)),
+        log_level="warning",
+    )
@@ -1,18 +1,46 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from typing import List, Optional, Set
 from app.models.job import JobCreate, JobResponse, JobUpdate
-from app.services.supabase_client import supabase_service
-from app.services.sqs_client import sqs_service
+from app.services.supabase_client import SupabaseService, get_supabase
+from app.services.sqs_client import SQSService, get_sqs
 from app.dependencies.auth import get_current_user_id, get_optional_user_id
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/jobs", tags=["jobs"])
 
+# Strong references to fire-and-forget tasks so they aren't garbage collected
+_background_tasks: Set[asyncio.Task] = set()
+
+
+async def drain_background_tasks():
+    """Wait for outstanding background writes; called on shutdown"""
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+
+
+async def _mark_job_failed(
+    supabase_service: SupabaseService, job_id: str, user_id: str, error_message: str
+):
+    """Record a failed job; runs after the error response has been sent"""
+    try:
+        await supabase_service.update_job(
+            job_id, JobUpdate(status="failed", error_message=error_message), user_id
+        )
+    except Exception as e:
+        logger.error("Failed to mark job %s as failed: %s", job_id, e)
+
 
 @router.post(
     "/submit-job", response_model=JobResponse, status_code=status.HTTP_201_CREATED
 )
 async def submit_job(
-    job: JobCreate, current_user_id: str = Depends(get_current_user_id)
+    job: JobCreate,
+    current_user_id: str = Depends(get_current_user_id),
+    supabase_service: SupabaseService = Depends(get_supabase),
+    sqs_service: SQSService = Depends(get_sqs),
 ):
     """
     Submit a new training job (requires authentication)
@@ -38,19 +66,27 @@ async def submit_job(
         )
 
         if not queue_success:
-            # If queue fails, update job status to failed
-            await supabase_service.update_job(
-                created_job.id,
-                JobUpdate(status="failed", error_message="Failed to queue job"),
-                current_user_id,
+            # If queue fails, update job status to failed without holding up the
+            # error response on another database round trip
+            task = asyncio.create_task(
+                _mark_job_failed(
+                    supabase_service,
+                    created_job.id,
+                    current_user_id,
+                    "Failed to queue job",
+                )
             )
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Job created but failed to queue for processing",
             )
 
-        print(
-            f"Job {created_job.id} created and queued successfully for user {current_user_id}"
+        logger.debug(
+            "Job %s created and queued successfully for user %s",
+            created_job.id,
+            current_user_id,
         )
         return created_job
 
@@ -62,10 +98,17 @@ async def submit_job(
 
 
 @router.get("/", response_model=List[JobResponse])
-async def get_user_jobs(current_user_id: str = Depends(get_current_user_id)):
-    """Get all jobs for the authenticated user"""
+async def get_user_jobs(
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    current_user_id: str = Depends(get_current_user_id),
+    supabase_service: SupabaseService = Depends(get_supabase),
+):
+    """Get jobs for the authenticated user, newest first"""
     try:
-        jobs = await supabase_service.get_jobs_by_user(current_user_id)
+        jobs = await supabase_service.get_jobs_by_user(
+            current_user_id, limit=limit, offset=offset
+        )
         return jobs
     except Exception as e:
         raise HTTPException(
@@ -75,13 +118,18 @@ async def get_user_jobs(current_user_id: str = Depends(get_current_user_id)):
 
 
 @router.get("/all", response_model=List[JobResponse])
-async def get_all_jobs():
+async def get_all_jobs(
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    supabase_service: SupabaseService = Depends(get_supabase),
+):
     """
     Get all jobs (admin endpoint - no authentication for now)
     This can be used by Modal or other services to process jobs
+    Returns every job by default; offset skips rows and limit caps the page size
     """
     try:
-        jobs = await supabase_service.get_all_jobs()
+        jobs = await supabase_service.get_all_jobs(limit=limit, offset=offset)
         return jobs
     except Exception as e:
         raise HTTPException(
@@ -91,7 +139,11 @@ async def get_all_jobs():
 
 
 @router.get("/{job_id}", response_model=JobResponse)
-async def get_job(job_id: str, current_user_id: str = Depends(get_current_user_id)):
+async def get_job(
+    job_id: str,
+    current_user_id: str = Depends(get_current_user_id),
+    supabase_service: SupabaseService = Depends(get_supabase),
+):
     """Get specific job by ID (only if it belongs to the user)"""
     try:
         job = await supabase_service.get_job_by_id(job_id, current_user_id)
@@ -1,14 +1,40 @@
+import base64
 import jwt
-import requests
+import httpx
+import orjson
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from fastapi import HTTPException, status
 import json
 from functools import lru_cache
+import hashlib
+import logging
+import threading
 import time
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Verified token payloads, keyed by SHA-256 of the raw token.
+# Entries are stored as (expires_at, payload) so they also honour the token's exp.
+PAYLOAD_CACHE_TTL = 30
+
+# Parsed signing keys per JWKS URL; Clerk rotates keys rarely
+JWKS_CACHE_TTL = 3600
+# Bounds the cache, since the URL comes from the unverified token issuer
+JWKS_CACHE_MAXSIZE = 16
+# Minimum gap between forced refetches of one JWKS URL on an unknown kid
+JWKS_MIN_REFRESH_INTERVAL = 60
+
+# Decoder with its options merged once, rather than on every jwt.decode call
+JWT_ALGORITHMS = ["RS256"]
+_jwt_decoder = jwt.PyJWT(options={"verify_aud": False, "verify_iss": False})
 
 
 class ClerkAuth:
+    _payload_cache: TTLCache = TTLCache(maxsize=10000, ttl=PAYLOAD_CACHE_TTL)
+    _payload_cache_lock = threading.Lock()
+
     def __init__(self):
         self.secret_key = os.getenv("CLERK_SECRET_KEY")
         self.publishable_key = os.getenv("CLERK_PUBLISHABLE_KEY")
@@ -19,38 +45,84 @@ class ClerkAuth:
         if not self.publishable_key:
             raise ValueError("CLERK_PUBLISHABLE_KEY environment variable is required")
 
+        # {jwks_url: (fetched_at, {kid: public_key})}
+        self._jwks_cache: TTLCache = TTLCache(
+            maxsize=JWKS_CACHE_MAXSIZE, ttl=JWKS_CACHE_TTL
+        )
+
+        # Shared pooled client so JWKS fetches don't block the event loop.
+        # Created lazily so it can be reopened after close() (e.g. a new lifespan)
+        self._http: Optional[httpx.AsyncClient] = None
+
         # For debugging
-        print(
-            f"Initializing Clerk with publishable key: {self.publishable_key[:20]}..."
+        logger.debug(
+            "Initializing Clerk with publishable key: %s...", self.publishable_key[:20]
         )
 
-    def get_jwks_url_from_token(self, token: str) -> str:
-        """Extract JWKS URL from token issuer"""
+        # The publishable key never changes, so resolve the fallback URL once.
+        # An unsupported key only fails when the fallback is actually needed.
+        self._fallback_jwks_url: Optional[str] = None
+        self._fallback_jwks_error: Optional[str] = None
         try:
-            # Decode without verification to get the issuer
-            payload = jwt.decode(
-                token, verify=False, options={"verify_signature": False}
+            self._fallback_jwks_url = self._compute_fallback_jwks_url()
+        except ValueError as e:
+            self._fallback_jwks_error = str(e)
+
+        # Last issuer seen and its JWKS URL; Clerk tokens all share one issuer
+        self._issuer: Optional[str] = None
+        self._issuer_jwks_url: Optional[str] = None
+
+    def _get_http(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it if needed"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=10, limits=httpx.Limits(max_connections=20)
             )
+        return self._http
+
+    async def close(self):
+        """Close the shared HTTP client; the next fetch opens a new one"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def get_jwks_url_from_token(self, payload: Dict[str, Any]) -> str:
+        """Extract JWKS URL from the (unverified) token payload's issuer"""
+        try:
             issuer = payload.get("iss")
 
+            if issuer and issuer == self._issuer:
+                return self._issuer_jwks_url
+
             if issuer:
                 # The issuer should be something like https://clerk.example.com
                 # JWKS URL would be {issuer}/.well-known/jwks.json
                 if issuer.endswith("/"):
                     issuer = issuer[:-1]  # Remove trailing slash
                 jwks_url = f"{issuer}/.well-known/jwks.json"
-                print(f"Extracted JWKS URL from token: {jwks_url}")
+                logger.debug("Extracted JWKS URL from token: %s", jwks_url)
+                self._issuer, self._issuer_jwks_url = payload["iss"], jwks_url
                 return jwks_url
             else:
                 raise ValueError("No issuer found in token")
 
         except Exception as e:
-            print(f"Error extracting JWKS URL from token: {e}")
+            logger.debug("Error extracting JWKS URL from token: %s", e)
             # Fallback to trying to construct from publishable key
             return self.construct_jwks_url_from_key()
 
     def construct_jwks_url_from_key(self) -> str:
-        """Fallback method to construct JWKS URL from publishable key"""
+        """Fallback method returning the JWKS URL built from the publishable key"""
+        if self._fallback_jwks_url is None:
+            logger.error(
+                "Error constructing JWKS URL from key: %s", self._fallback_jwks_error
+            )
+            # A fresh exception each time, so tracebacks don't pile up on one instance
+            raise ValueError(self._fallback_jwks_error)
+        return self._fallback_jwks_url
+
+    def _compute_fallback_jwks_url(self) -> str:
+        """Construct JWKS URL from publishable key"""
         try:
             # Try different patterns based on the publishable key format
             if self.publishable_key.startswith("pk_test_"):
@@ -62,7 +134,7 @@ class ClerkAuth:
                 jwks_url = (
                     f"https://{instance_id}.clerk.accounts.dev/.well-known/jwks.json"
                 )
-                print(f"Constructed JWKS URL from key: {jwks_url}")
+                logger.debug("Constructed JWKS URL from key: %s", jwks_url)
                 return jwks_url
 
             elif self.publishable_key.startswith("pk_live_"):
@@ -74,52 +146,76 @@ class ClerkAuth:
                 jwks_url = (
                     f"https://{instance_id}.clerk.accounts.dev/.well-known/jwks.json"
                 )
-                print(f"Constructed JWKS URL from key: {jwks_url}")
+                logger.debug("Constructed JWKS URL from key: %s", jwks_url)
                 return jwks_url
 
             else:
                 raise ValueError("Unsupported publishable key format")
 
         except Exception as e:
-            print(f"Error constructing JWKS URL from key: {e}")
+            # Logged as an error by construct_jwks_url_from_key if actually needed
+            logger.debug("Error constructing JWKS URL from key: %s", e)
             raise ValueError(f"Cannot determine JWKS URL: {e}")
 
-    def get_jwks(self, token: str) -> Dict[str, Any]:
+    async def get_jwks(self, jwks_url: str) -> Dict[str, Any]:
         """Fetch JWKS from Clerk"""
         try:
-            # First try to get JWKS URL from token
-            jwks_url = self.get_jwks_url_from_token(token)
-
-            print(f"Fetching JWKS from: {jwks_url}")
-            response = requests.get(jwks_url, timeout=10)
+            logger.debug("Fetching JWKS from: %s", jwks_url)
+            response = await self._get_http().get(jwks_url)
 
             if response.status_code != 200:
-                print(
-                    f"JWKS request failed with status {response.status_code}: {response.text}"
+                logger.warning(
+                    "JWKS request failed with status %s: %s",
+                    response.status_code,
+                    response.text,
                 )
 
             response.raise_for_status()
             jwks_data = response.json()
-            print(
-                f"Successfully fetched JWKS with {len(jwks_data.get('keys', []))} keys"
+            logger.debug(
+                "Successfully fetched JWKS with %d keys", len(jwks_data.get("keys", []))
             )
             return jwks_data
 
         except Exception as e:
-            print(f"Error fetching JWKS: {e}")
+            logger.error("Error fetching JWKS: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to fetch authentication keys: {str(e)}",
             )
 
-    def get_signing_key(self, token: str) -> str:
+    async def get_signing_keys(
+        self, jwks_url: str, refresh: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Get the {kid: public_key} map for a JWKS URL, refetching only when stale
+        A forced refresh is ignored if the URL was fetched in the last
+        JWKS_MIN_REFRESH_INTERVAL seconds, so unknown kids can't defeat the cache
+        """
+        cached = self._jwks_cache.get(jwks_url)
+        if cached is not None:
+            fetched_at, signing_keys = cached
+            if not refresh or time.time() - fetched_at < JWKS_MIN_REFRESH_INTERVAL:
+                return signing_keys
+
+        jwks = await self.get_jwks(jwks_url)
+        signing_keys = {
+            # PyJWK builds the key object directly, no PEM round-trip needed
+            key["kid"]: jwt.PyJWK(key).key
+            for key in jwks.get("keys", [])
+            if key.get("kid") and key.get("kty") == "RSA"
+        }
+        self._jwks_cache[jwks_url] = (time.time(), signing_keys)
+        return signing_keys
+
+    async def get_signing_key(self, token: str) -> Any:
         """Get the signing key for JWT verification"""
         try:
-            # Decode header without verification to get kid
-            header = jwt.get_unverified_header(token)
+            # Decode header and payload without verification to get kid and issuer
+            header, payload = self._peek(token)
             kid = header.get("kid")
 
-            print(f"Token kid: {kid}")
+            logger.debug("Token kid: %s", kid)
 
             if not kid:
                 raise HTTPException(
@@ -127,36 +223,21 @@ class ClerkAuth:
                     detail="Token missing key ID",
                 )
 
-            # Get JWKS and find the matching key
-            jwks = self.get_jwks(token)
-
-            for key in jwks.get("keys", []):
-                if key.get("kid") == kid:
-                    print(f"Found matching key for kid: {kid}")
-                    # Convert JWK to PEM format for PyJWT
-                    from cryptography.hazmat.primitives.asymmetric import rsa
-                    from cryptography.hazmat.primitives import serialization
-
-                    # Extract RSA components
-                    n = self._base64url_decode(key["n"])
-                    e = self._base64url_decode(key["e"])
+            # JWKS URL is derived from the token issuer, so keys are cached per issuer
+            jwks_url = self.get_jwks_url_from_token(payload)
+            signing_keys = await self.get_signing_keys(jwks_url)
 
-                    # Create RSA public key
-                    public_numbers = rsa.RSAPublicNumbers(
-                        int.from_bytes(e, "big"), int.from_bytes(n, "big")
-                    )
-                    public_key = public_numbers.public_key()
-
-                    # Convert to PEM format
-                    pem = public_key.public_bytes(
-                        encoding=serialization.Encoding.PEM,
-                        format=serialization.PublicFormat.SubjectPublicKeyInfo,
-                    )
+            if kid not in signing_keys:
+                # Unknown kid may mean Clerk rotated its keys - refetch (rate-limited)
+                signing_keys = await self.get_signing_keys(
+                    jwks_url, refresh=True
+                )
 
-                    return pem.decode("utf-8")
+            if kid in signing_keys:
+                return signing_keys[kid]
 
-            available_kids = [k.get("kid") for k in jwks.get("keys", [])]
-            print(f"Available key IDs: {available_kids}")
+            available_kids = list(signing_keys)
+            logger.debug("Available key IDs: %s", available_kids)
 
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -166,35 +247,48 @@ class ClerkAuth:
         except Exception as e:
             if isinstance(e, HTTPException):
                 raise
-            print(f"Error getting signing key: {e}")
+            logger.debug("Error getting signing key: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail=f"Invalid token format: {str(e)}",
             )
 
+    def _peek(self, token: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Decode the unverified header and payload of a JWT in one pass"""
+        segments = token.split(".")
+        if len(segments) != 3:
+            raise ValueError("Token must have three segments")
+
+        header = orjson.loads(self._base64url_decode(segments[0]))
+        payload = orjson.loads(self._base64url_decode(segments[1]))
+        if not isinstance(header, dict) or not isinstance(payload, dict):
+            raise ValueError("Token header and payload must be JSON objects")
+        return header, payload
+
     def _base64url_decode(self, data: str) -> bytes:
         """Decode base64url string"""
-        import base64
-
         # Add padding if needed
         padding = 4 - len(data) % 4
         if padding != 4:
             data += "=" * padding
         return base64.urlsafe_b64decode(data)
 
-    def verify_token(self, token: str) -> Dict[str, Any]:
+    async def verify_token(self, token: str) -> Dict[str, Any]:
         """Verify Clerk JWT token and return claims"""
+        cache_key = hashlib.sha256(token.encode()).digest()
+        with self._payload_cache_lock:
+            cached = self._payload_cache.get(cache_key)
+        if cached is not None:
+            expires_at, payload = cached
+            if time.time() < expires_at:
+                return payload
+
         try:
             # Get signing key
-            signing_key = self.get_signing_key(token)
+            signing_key = await self.get_signing_key(token)
 
             # Verify and decode token
-            payload = jwt.decode(
-                token,
-                signing_key,
-                algorithms=["RS256"],
-                options={"verify_aud": False, "verify_iss": False},
-            )
+            payload = _jwt_decoder.decode(token, signing_key, algorithms=JWT_ALGORITHMS)
 
             # Verify token is not expired
             current_time = int(time.time())
@@ -203,11 +297,17 @@ class ClerkAuth:
                     status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired"
                 )
 
-            print(f"Token verified successfully for user: {payload.get('sub')}")
+            logger.debug("Token verified successfully for user: %s", payload.get("sub"))
+
+            # Only successful verifications are cached
+            expires_at = min(time.time() + PAYLOAD_CACHE_TTL, payload["exp"])
+            with self._payload_cache_lock:
+                self._payload_cache[cache_key] = (expires_at, payload)
+
             return payload
 
         except jwt.InvalidTokenError as e:
-            print(f"JWT validation error: {e}")
+            logger.debug("JWT validation error: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail=f"Invalid token: {str(e)}",
@@ -215,15 +315,15 @@ class ClerkAuth:
         except Exception as e:
             if isinstance(e, HTTPException):
                 raise
-            print(f"Token verification error: {e}")
+            logger.debug("Token verification error: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail=f"Token verification failed: {str(e)}",
             )
 
-    def get_user_id(self, token: str) -> str:
+    async def get_user_id(self, token: str) -> str:
         """Extract user ID from token"""
-        payload = self.verify_token(token)
+        payload = await self.verify_token(token)
         user_id = payload.get("sub")  # 'sub' claim contains the user ID
 
         if not user_id:
@@ -1,12 +1,37 @@
+import asyncio
 import boto3
 import json
+import logging
+import orjson
 import os
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from botocore.exceptions import ClientError
 
+logger = logging.getLogger(__name__)
+
+# send_message_batch accepts at most 10 entries
+SQS_BATCH_SIZE = 10
+# How long the first message in a batch waits for others to join it (seconds)
+SQS_BATCH_WINDOW = 0.05
+# Total payload limit for a single send_message_batch call
+SQS_MAX_BATCH_BYTES = 256 * 1024
+
+
+def _encode_body(message_body: Dict[str, Any]) -> str:
+    """Serialize a message body, falling back to json for what orjson rejects"""
+    try:
+        return orjson.dumps(message_body).decode()
+    except orjson.JSONEncodeError:
+        # e.g. integers beyond 64 bits, which the json module still accepts
+        return json.dumps(message_body)
+
 
 class SQSService:
     def __init__(self):
+        self._pending: Optional[asyncio.Queue] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
         try:
             self.sqs = boto3.client(
                 "sqs",
@@ -20,53 +45,191 @@ class SQSService:
                 self.queue_url and self.queue_url != "your_sqs_queue_url"
             )
             if not self.is_configured:
-                print(
-                    "Warning: AWS SQS not fully configured (missing Queue URL or using placeholder). Running in development mode for SQS."
+                logger.warning(
+                    "AWS SQS not fully configured (missing Queue URL or using placeholder). Running in development mode for SQS."
                 )
             else:
-                print("AWS SQS client initialized and configured.")
+                logger.info("AWS SQS client initialized and configured.")
 
         except Exception as e:
             # This catch block handles issues if boto3 can't even initialize,
             # for example, due to invalid region or underlying AWS configuration.
-            print(
-                f"AWS SQS client initialization failed: {e}. SQS functionality will be simulated."
+            logger.warning(
+                "AWS SQS client initialization failed: %s. SQS functionality will be simulated.",
+                e,
             )
             self.is_configured = False  # Explicitly set to False if client init fails
 
-    async def send_job_to_queue(self, job_id: str, job_data: Dict[str, Any]) -> bool:
-        """Send a job to SQS queue"""
+    async def start(self):
+        """Start the background task that batches queued messages"""
+        if not self.is_configured or self._flush_task is not None:
+            return
+        self._pending = asyncio.Queue()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Send any messages still waiting and stop the batching task"""
+        if self._flush_task is None:
+            return
+        await self._pending.put(None)
+        await self._flush_task
+        self._flush_task = None
+
+    async def send_job_to_queue(
+        self, job_id: str, job_data: Dict[str, Any], flush_immediately: bool = False
+    ) -> bool:
+        """
+        Send a job to SQS queue
+        Messages are coalesced into send_message_batch calls unless
+        flush_immediately is set or the batching task isn't running
+        """
         if not self.is_configured:
-            print(f"SQS not configured - simulating queue for job {job_id}")
-            print(f"Simulated Job data for SQS: {job_data}")
+            logger.debug("SQS not configured - simulating queue for job %s", job_id)
+            logger.debug("Simulated Job data for SQS: %s", job_data)
             return True  # Simulate success for development
 
-        # If configured, proceed with actual SQS send
-        try:
-            message_body = {
-                "job_id": job_id,
-                "job_data": job_data,
-                "action": "start_training",  # Or whatever action is appropriate for Modal trigger
-            }
+        message_body = {
+            "job_id": job_id,
+            "job_data": job_data,
+            "action": "start_training",  # Or whatever action is appropriate for Modal trigger
+        }
 
-            response = self.sqs.send_message(
+        if flush_immediately or self._flush_task is None:
+            return await self._send_message(job_id, message_body)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._pending.put((job_id, message_body, future))
+        return await future
+
+    async def _send_message(self, job_id: str, message_body: Dict[str, Any]) -> bool:
+        """Send a single message to SQS"""
+        try:
+            # boto3 is blocking, so run the call in a worker thread
+            response = await asyncio.to_thread(
+                self.sqs.send_message,
                 QueueUrl=self.queue_url,
-                MessageBody=json.dumps(message_body),
+                MessageBody=_encode_body(message_body),
                 MessageAttributes={
                     "job_id": {"StringValue": job_id, "DataType": "String"}
                 },
             )
 
-            print(f"Message sent to SQS. MessageId: {response['MessageId']}")
+            logger.debug("Message sent to SQS. MessageId: %s", response["MessageId"])
             return True
 
         except ClientError as e:
-            print(f"Error sending message to SQS: {e}")
+            logger.error("Error sending message to SQS: %s", e)
             return False
         except Exception as e:
-            print(f"Unexpected error when sending to SQS: {e}")
+            logger.exception("Unexpected error when sending to SQS: %s", e)
             return False
 
+    async def _flush_loop(self):
+        """Drain up to SQS_BATCH_SIZE messages, waiting at most SQS_BATCH_WINDOW"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._pending.get()
+            if item is None:
+                break
+
+            batch = [item]
+            try:
+                deadline = loop.time() + SQS_BATCH_WINDOW
+                while len(batch) < SQS_BATCH_SIZE:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._pending.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                await self._send_batch(batch)
+            except Exception as e:
+                # Never let one bad batch kill the loop and strand later callers
+                logger.exception("Unexpected error in SQS batching loop: %s", e)
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_result(False)
+
+    async def _send_batch(
+        self, batch: List[Tuple[str, Dict[str, Any], asyncio.Future]]
+    ):
+        """
+        Send a batch of messages and resolve each caller's future
+        Messages that can't be serialized fail on their own, and the rest are
+        split so no single send_message_batch call exceeds SQS_MAX_BATCH_BYTES
+        """
+        chunks: List[List[Tuple[Dict[str, Any], asyncio.Future]]] = []
+        chunk_bytes = 0
+
+        for index, (job_id, message_body, future) in enumerate(batch):
+            try:
+                body = _encode_body(message_body)
+            except Exception as e:
+                logger.error(
+                    "Could not serialize SQS message for job %s: %s", job_id, e
+                )
+                if not future.done():
+                    future.set_result(False)
+                continue
+
+            entry = {
+                "Id": str(index),
+                "MessageBody": body,
+                "MessageAttributes": {
+                    "job_id": {"StringValue": job_id, "DataType": "String"}
+                },
+            }
+            # Attribute name, type and value all count towards the SQS size limit
+            entry_bytes = len(body.encode()) + len("job_id" + job_id + "String")
+            if entry_bytes > SQS_MAX_BATCH_BYTES:
+                logger.error("SQS message for job %s is too large to send", job_id)
+                if not future.done():
+                    future.set_result(False)
+                continue
+
+            if not chunks or chunk_bytes + entry_bytes > SQS_MAX_BATCH_BYTES:
+                chunks.append([])
+                chunk_bytes = 0
+            chunks[-1].append((entry, future))
+            chunk_bytes += entry_bytes
+
+        for chunk in chunks:
+            await self._send_entries(chunk)
+
+    async def _send_entries(self, chunk: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        """Send one send_message_batch call and resolve each entry's future"""
+        entries = [entry for entry, _ in chunk]
+
+        try:
+            response = await asyncio.to_thread(
+                self.sqs.send_message_batch, QueueUrl=self.queue_url, Entries=entries
+            )
+        except Exception as e:
+            logger.error("Error sending message batch to SQS: %s", e)
+            response = {"Failed": [{"Id": entry["Id"]} for entry in entries]}
+
+        results = {entry["Id"]: True for entry in response.get("Successful", [])}
+        for failed in response.get("Failed", []):
+            logger.error(
+                "SQS rejected message %s: %s", failed["Id"], failed.get("Message")
+            )
+            results[failed["Id"]] = False
+
+        logger.debug("Sent batch of %d messages to SQS", len(entries))
+        for entry, future in chunk:
+            if not future.done():
+                future.set_result(results.get(entry["Id"], False))
+
 
-# Global instance
-sqs_service = SQSService()
+@lru_cache(maxsize=1)
+def get_sqs() -> SQSService:
+    """Shared SQSService instance, created on first use"""
+    return SQSService()
@@ -1,8 +1,22 @@
-from supabase import create_client, Client
+from supabase import acreate_client, AClient
+from cachetools import TTLCache
+from functools import lru_cache
+from pydantic import TypeAdapter
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional
 from app.models.job import JobCreate, JobResponse, JobUpdate
 
+# Only the columns JobResponse needs
+JOB_COLUMNS = "id,user_id,name,status,created_at,updated_at,modal_call_id,error_message"
+
+# Validates a whole result set in one call instead of one JobResponse(**row) per row
+_JOB_LIST_ADAPTER = TypeAdapter(List[JobResponse])
+
+# Short-lived per-process read cache so polling dashboards don't hit the database
+# every time. Writes invalidate it in this process only; other workers may serve
+# reads up to JOB_CACHE_TTL seconds stale.
+JOB_CACHE_TTL = 2
+
 
 class SupabaseService:
     def __init__(self):
@@ -12,12 +26,42 @@ class SupabaseService:
         if not url or not key:
             raise ValueError("Supabase URL and Service Key must be set")
 
-        self.supabase: Client = create_client(url, key)
+        self.url = url
+        self.key = key
+        self.supabase: Optional[AClient] = None
+
+        # ("job", job_id, user_id) -> JobResponse
+        # ("jobs", user_id, limit, offset) -> List[JobResponse]
+        self._cache: TTLCache = TTLCache(maxsize=2048, ttl=JOB_CACHE_TTL)
+        # Bumped on every write for a user; a read only populates the cache if the
+        # user's generation didn't change while it ran, so it can't re-cache stale data
+        self._generations: Dict[str, int] = {}
+
+    def _invalidate(self, user_id: Optional[str] = None, job_id: Optional[str] = None):
+        """Drop cached job lists for user_id and cached lookups of job_id"""
+        if user_id is not None:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        for key in list(self._cache.keys()):
+            if (key[0] == "jobs" and key[1] == user_id) or (
+                key[0] == "job" and key[1] == job_id
+            ):
+                self._cache.pop(key, None)
+
+    async def connect(self):
+        """Create the async client; its HTTP session is reused across requests"""
+        if self.supabase is None:
+            self.supabase = await acreate_client(self.url, self.key)
+
+    async def close(self):
+        """Close the pooled PostgREST connections"""
+        if self.supabase is not None:
+            await self.supabase.postgrest.aclose()
+            self.supabase = None
 
     async def create_job(self, job: JobCreate, user_id: str) -> JobResponse:
         """Create a new job in Supabase with user_id"""
         try:
-            result = (
+            result = await (
                 self.supabase.table("jobs")
                 .insert(
                     {
@@ -33,6 +77,7 @@ class SupabaseService:
             )
 
             if result.data:
+                self._invalidate(user_id=user_id)
                 return JobResponse(**result.data[0])
             else:
                 raise Exception("Failed to create job")
@@ -40,48 +85,90 @@ class SupabaseService:
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
 
-    async def get_jobs_by_user(self, user_id: str) -> List[JobResponse]:
-        """Get all jobs for a specific user"""
+    async def get_jobs_by_user(
+        self, user_id: str, limit: int = 50, offset: int = 0
+    ) -> List[JobResponse]:
+        """
+        Get a page of jobs for a specific user, newest first
+        Served by idx_jobs_user_created (migrations/001_jobs_indexes.sql)
+        """
+        cache_key = ("jobs", user_id, limit, offset)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+        generation = self._generations.get(user_id, 0)
+
         try:
-            result = (
+            result = await (
                 self.supabase.table("jobs")
-                .select("*")
+                .select(JOB_COLUMNS)
                 .eq("user_id", user_id)  # Filter by user_id
                 .order("created_at", desc=True)
+                .range(offset, offset + limit - 1)
                 .execute()
             )
-            return [JobResponse(**job) for job in result.data]
+            jobs = _JOB_LIST_ADAPTER.validate_python(result.data)
+            if self._generations.get(user_id, 0) == generation:
+                self._cache[cache_key] = jobs
+            return jobs
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
 
-    async def get_all_jobs(self) -> List[JobResponse]:
-        """Get all jobs (admin function - keeping for backwards compatibility)"""
+    async def get_all_jobs(
+        self, limit: Optional[int] = None, offset: int = 0
+    ) -> List[JobResponse]:
+        """
+        Get all jobs (admin function - keeping for backwards compatibility)
+        Returns every row from offset onwards unless a limit is given;
+        job processors rely on seeing every row
+        """
         try:
-            result = (
+            query = (
                 self.supabase.table("jobs")
-                .select("*")
+                .select(JOB_COLUMNS)
                 .order("created_at", desc=True)
-                .execute()
             )
-            return [JobResponse(**job) for job in result.data]
+            if limit is not None:
+                query = query.range(offset, offset + limit - 1)
+            elif offset:
+                query = query.offset(offset)
+
+            result = await query.execute()
+            return _JOB_LIST_ADAPTER.validate_python(result.data)
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
 
     async def get_job_by_id(
         self, job_id: str, user_id: Optional[str] = None
     ) -> Optional[JobResponse]:
-        """Get a specific job by ID, optionally filtered by user_id"""
+        """
+        Get a specific job by ID, optionally filtered by user_id
+        Only user-scoped lookups are cached, since writes are tracked per user
+        """
+        cache_key = ("job", job_id, user_id)
+        if user_id is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+        generation = self._generations.get(user_id, 0)
+
         try:
-            query = self.supabase.table("jobs").select("*").eq("id", job_id)
+            query = self.supabase.table("jobs").select(JOB_COLUMNS).eq("id", job_id)
 
             # If user_id is provided, also filter by user
             if user_id:
                 query = query.eq("user_id", user_id)
 
-            result = query.execute()
+            result = await query.execute()
 
             if result.data:
-                return JobResponse(**result.data[0])
+                job = JobResponse(**result.data[0])
+                if (
+                    user_id is not None
+                    and self._generations.get(user_id, 0) == generation
+                ):
+                    self._cache[cache_key] = job
+                return job
             return None
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
@@ -91,7 +178,7 @@ class SupabaseService:
     ) -> Optional[JobResponse]:
         """Update a job in Supabase, optionally filtered by user_id"""
         try:
-            update_data = {k: v for k, v in update.dict().items() if v is not None}
+            update_data = update.model_dump(exclude_none=True, mode="json")
 
             query = self.supabase.table("jobs").update(update_data).eq("id", job_id)
 
@@ -99,14 +186,18 @@ class SupabaseService:
             if user_id:
                 query = query.eq("user_id", user_id)
 
-            result = query.execute()
+            result = await query.execute()
 
             if result.data:
-                return JobResponse(**result.data[0])
+                job = JobResponse(**result.data[0])
+                self._invalidate(user_id=job.user_id, job_id=job_id)
+                return job
             return None
         except Exception as e:
             raise Exception(f"Database error: {str(e)}")
 
 
-# Global instance
-supabase_service = SupabaseService()
+@lru_cache(maxsize=1)
+def get_supabase() -> SupabaseService:
+    """Shared SupabaseService instance, created on first use"""
+    return SupabaseService()
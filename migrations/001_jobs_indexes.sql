@@ -0,0 +1,8 @@
+-- Backs SupabaseService.get_jobs_by_user: filter by user_id, newest first.
+-- Free-text columns (name, error_message) are deliberately not INCLUDEd: a long
+-- value would exceed the btree row size limit and make the INSERT/UPDATE fail.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so apply
+-- this file on its own (e.g. psql "$DATABASE_URL" -f migrations/001_jobs_indexes.sql).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_user_created
+    ON jobs (user_id, created_at DESC);